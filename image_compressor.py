@@ -1,19 +1,409 @@
+import io
+import mmap
 import os
 import sys
+import shutil
+import struct
+import subprocess
 import argparse
+import atexit
 import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import numpy as np
 import psutil
-from PIL import Image
+import PIL
+from PIL import Image, JpegImagePlugin, features
 from tqdm import tqdm
-from multiprocessing import Manager, Queue
 
-def worker_init(q):
+try:
+    import turbojpeg
+except ImportError:
+    turbojpeg = None
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+RESAMPLING_FILTERS = {
+    'lanczos': Image.Resampling.LANCZOS,
+    'bicubic': Image.Resampling.BICUBIC,
+    'hamming': Image.Resampling.HAMMING,
+    'box': Image.Resampling.BOX,
+    'bilinear': Image.Resampling.BILINEAR,
+    'nearest': Image.Resampling.NEAREST,
+}
+# Sum of the IJG standard luminance quantization table that libjpeg scales by quality
+STD_LUMINANCE_QTABLE_SUM = sum([
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+])
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.webp', '.tiff', '.gif', '.bmp'})
+JPEGTRAN = shutil.which("jpegtran")
+EXTENSION_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png', '.webp': 'webp'}
+IO_THREADS = 4  # Threads used for read-ahead and write-behind in serial mode
+READ_AHEAD = 16  # Maximum number of images buffered in memory on either side of the encoder
+MMAP_THRESHOLD = 16 * 1024 * 1024  # Inputs at least this large are memory-mapped rather than read
+ARENA_BLOCKS = 8  # Freed image blocks (16 MiB each) Pillow keeps per process for reuse
+MAX_CHUNKSIZE = 8  # Most images handed to a pool worker at once
+STRIPE_PIXELS = 50_000_000  # Images with more pixels than this are resized in stripes on several threads
+RESIZE_STRIPES = 8  # Most horizontal stripes, and threads, used for such images
+
+_turbojpeg_handle = None  # Per-process TurboJPEG instance, created on first use
+_cv2_module = None  # OpenCV, imported on first use since loading it is slow and most runs never need it
+
+def _get_turbojpeg():
+    """
+    Returns this process's TurboJPEG handle, loading libturbojpeg on first use.
+    :return: TurboJPEG instance, or None if PyTurboJPEG or the library is unavailable.
+    """
+    global _turbojpeg_handle
+    if _turbojpeg_handle is None and turbojpeg is not None:
+        try:
+            _turbojpeg_handle = turbojpeg.TurboJPEG()
+        except (OSError, RuntimeError):
+            pass
+    return _turbojpeg_handle
+
+def _get_cv2():
+    """
+    Returns the OpenCV module, importing it on first use in this process.
+    :return: cv2 module, or None if OpenCV is not installed.
+    """
+    global _cv2_module
+    if _cv2_module is None:
+        try:
+            import cv2
+        except ImportError:
+            return None
+        _cv2_module = cv2
+    return _cv2_module
+
+def _init_image_arena():
+    """
+    Lets Pillow keep freed image memory blocks for the next image instead of
+    returning them to the OS, so each decode doesn't pay for fresh page faults.
+    Pillow caches no blocks by default; an explicit PILLOW_BLOCKS_MAX is respected.
+    """
+    if "PILLOW_BLOCKS_MAX" not in os.environ:
+        Image.core.set_blocks_max(ARENA_BLOCKS)
+
+def _error_message(input_path, size, error):
+    """
+    Formats the console/error log line for a failed image.
+    :param input_path: Path of the image that failed.
+    :param size: Input file size in bytes, as recorded during enumeration.
+    :param error: Exception raised while processing the image.
+    :return: Error message string.
+    """
+    return f"Error :: {input_path} ({size} bytes) :: {error}"
+
+def _read_file(path, size):
+    """
+    Loads a file into memory with a single open/read/close. Files of MMAP_THRESHOLD
+    bytes or more are memory-mapped instead, which avoids copying them into userspace.
+    :param path: Path of the file to read.
+    :param size: File size recorded during enumeration.
+    :return: Seekable binary file object over the file contents.
+    """
+    with open(path, "rb", buffering=0) as f:
+        if size >= MMAP_THRESHOLD:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return io.BytesIO(f.read())
+
+def _write_file(path, data):
+    """
+    Writes encoded image bytes to disk.
+    :param path: Destination file path.
+    :param data: Encoded image bytes.
+    """
+    with open(path, "wb") as f:
+        f.write(data)
+
+def _write_output(destination, data):
+    """
+    Writes encoded image bytes to an output path or binary file object.
+    :param destination: Output file path or binary file object.
+    :param data: Encoded image bytes.
+    """
+    if isinstance(destination, str):
+        _write_file(destination, data)
+    else:
+        destination.write(data)
+
+def _insert_exif(jpeg, exif_data):
+    """
+    Adds an EXIF APP1 segment to JPEG data produced by an encoder that doesn't write one.
+    The segment goes right after the JFIF APP0 header, or after SOI if there is none.
+    :param jpeg: Encoded JPEG bytes.
+    :param exif_data: Raw EXIF block as found in Pillow's img.info['exif'].
+    :return: JPEG bytes including the EXIF data.
+    """
+    if not exif_data:
+        return jpeg
+    position = 2
+    if jpeg[2:4] == b"\xff\xe0":
+        position += 2 + struct.unpack(">H", jpeg[4:6])[0]
+    segment = b"\xff\xe1" + struct.pack(">H", len(exif_data) + 2) + exif_data
+    return jpeg[:position] + segment + jpeg[position:]
+
+def _is_up_to_date(image):
+    """
+    Checks whether an image's output already exists and is at least as new as its input.
+    :param image: Tuple of (input_path, output_path, size, mtime) from enumeration.
+    :return: True if the image can be skipped.
+    """
+    _, output_path, _, input_mtime = image
+    try:
+        return os.stat(output_path).st_mtime >= input_mtime
+    except OSError:
+        return False
+
+def _target_size(size, max_width):
+    """
+    Computes the size of an image scaled down to max_width, keeping its aspect ratio.
+    :param size: Source (width, height).
+    :param max_width: Target width.
+    :return: Target (width, height).
+    """
+    width, height = size
+    return max_width, max(1, height * max_width // width)
+
+def _resampling_filter(name, width, max_width):
+    """
+    Resolves a --filter choice to a Pillow resampling filter. In 'auto' mode, cheaper
+    filters are used for large downscales, where they look the same as LANCZOS.
+    :param name: Filter name, or 'auto'.
+    :param width: Width of the image being resized.
+    :param max_width: Target width.
+    :return: Member of Image.Resampling.
+    """
+    if name == 'auto':
+        ratio = width / max_width
+        name = 'box' if ratio >= 4 else 'hamming' if ratio >= 2 else 'lanczos'
+    return RESAMPLING_FILTERS[name]
+
+def _resize(img, size, resample, reducing_gap, stripes=RESIZE_STRIPES):
+    """
+    Resizes an image with Pillow. Very large images are split into horizontal stripes
+    resized on separate threads, since Pillow releases the GIL while resampling.
+    Each stripe reads the source through resize's box argument, so the filter still
+    sees pixels across stripe edges and no seams appear.
+    :param img: Source image.
+    :param size: Target (width, height).
+    :param resample: Pillow resampling filter.
+    :param reducing_gap: Pre-reduce gap passed to Image.resize, or None.
+    :param stripes: Most stripes to split into; 1 always resizes in one piece.
+    :return: Resized image.
+    """
+    stripes = min(stripes, size[1])  # Every stripe needs at least one output row
+    if stripes <= 1 or img.width * img.height <= STRIPE_PIXELS:
+        return img.resize(size, resample, reducing_gap=reducing_gap)
+
+    width, height = img.size
+    if reducing_gap and resample != Image.Resampling.NEAREST:
+        # Reduce the whole image once, as resize would; reducing stripe by stripe misaligns their edges
+        factor = (max(1, int(width / size[0] / reducing_gap)), max(1, int(height / size[1] / reducing_gap)))
+        if factor != (1, 1):
+            img = img.reduce(factor)
+            width, height = width / factor[0], height / factor[1]
+    row_scale = height / size[1]
+    bounds = [size[1] * i // stripes for i in range(stripes + 1)]
+
+    def resize_stripe(i):
+        top, bottom = bounds[i], bounds[i + 1]
+        return img.resize((size[0], bottom - top), resample, box=(0, top * row_scale, width, bottom * row_scale))
+
+    resized = Image.new(img.mode, size)
+    with ThreadPoolExecutor(stripes) as executor:
+        for top, stripe in zip(bounds, executor.map(resize_stripe, range(stripes))):
+            resized.paste(stripe, (0, top))
+    return resized
+
+def _ensure_mode_for_output(img, output_format):
+    """
+    Converts an image to a mode the output format can store, copying pixels only
+    when the mode actually changes. Transparency is kept for PNG/WebP output.
+    :param img: Source image.
+    :param output_format: Desired output image format.
+    :return: Image in 'RGB' or 'RGBA' mode.
+    """
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+    mode = "RGBA" if has_alpha and output_format != 'jpeg' else "RGB"
+    if img.mode != mode:
+        img = img.convert(mode)
+    return img
+
+def _source_bytes(source):
+    """
+    Returns the raw, still-encoded bytes of an input image.
+    :param source: Input file path or binary file object.
+    :return: File contents as bytes.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    source.seek(0)
+    return source.read()
+
+def _estimate_jpeg_quality(img):
+    """
+    Estimates the libjpeg quality setting a JPEG was saved with by comparing its
+    luminance quantization table against the standard table that setting scales.
+    Below about quality 25, libjpeg clamps table entries at 255, so the estimate
+    reads high (q1 comes out as 11, q5 as 13). That errs toward re-encoding, never
+    toward keeping a file the user asked to compress harder.
+    :param img: Opened (not necessarily loaded) JPEG image.
+    :return: Estimated quality (1-100), or None if the image has no quantization tables.
+    """
+    tables = getattr(img, 'quantization', None)
+    if not tables or 0 not in tables:
+        return None
+    # libjpeg scales every entry by the same factor, so the table sums give it regardless of coefficient order
+    scale = sum(tables[0]) * 100 / STD_LUMINANCE_QTABLE_SUM
+    return round((200 - scale) / 2 if scale <= 100 else 5000 / scale)
+
+def _can_copy_unchanged(input_path, options):
+    """
+    Checks from the file extension alone whether an input can be copied as-is:
+    passthrough is enabled, no resize is requested and it is already in the output format.
+    :param input_path: Path of the input image.
+    :param options: Compression settings built by ImageCompressor._options.
+    :return: True if the file can be copied without decoding.
+    """
+    if not options['passthrough'] or options['resize']:
+        return False
+    return EXTENSION_FORMATS.get(os.path.splitext(input_path)[1].lower()) == options['output_format']
+
+def _optimize_jpeg_lossless(source, destination):
+    """
+    Rewrites a JPEG with optimized Huffman tables using jpegtran. The DCT
+    coefficients are copied unchanged, so pixel values are preserved exactly.
+    :param source: Input file path or binary file object.
+    :param destination: Output file path or binary file object.
+    """
+    result = subprocess.run([JPEGTRAN, "-copy", "all", "-optimize"], input=_source_bytes(source), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Exit status 2 means jpegtran only warned (e.g. extraneous bytes before a marker) and still wrote the JPEG
+    if result.returncode not in (0, 2) or not result.stdout:
+        raise RuntimeError(f"jpegtran failed with exit status {result.returncode}: {result.stderr.decode(errors='replace').strip()}")
+    _write_output(destination, result.stdout)
+
+def _process_image(source, destination, options):
+    """
+    Decodes, converts, optionally resizes and encodes a single image.
+    :param source: Input file path or binary file object.
+    :param destination: Output file path or binary file object.
+    :param options: Compression settings built by ImageCompressor._options.
+    """
+    quality = options['quality']
+    resize = options['resize']
+    max_width = options['max_width']
+    output_format = options['output_format']
+    try:
+        img = Image.open(source)
+    except Image.UnidentifiedImageError:
+        # Pillow names the in-memory buffer here; the caller already reports the path
+        raise Image.UnidentifiedImageError("cannot identify image file") from None
+    with img:
+        # Camera JPEGs with extra frames open as MPO, a JpegImageFile subclass, but are still JPEGs
+        source_format = 'jpeg' if isinstance(img, JpegImagePlugin.JpegImageFile) else img.format.lower()
+        if options['passthrough'] and source_format == output_format and not (resize and img.width > max_width):
+            # Already in the target format and within max_width, so re-encoding would only lose quality
+            _write_output(destination, _source_bytes(source))
+            return
+        if source_format == 'jpeg' and output_format == 'jpeg' and not (resize and img.width > max_width):
+            source_quality = _estimate_jpeg_quality(img)
+            # Re-encoding a JPEG at the same or a higher quality only adds generation loss;
+            # jpegtran gets the entropy-coding savings without touching the pixels. It can't
+            # apply encoder settings, so any the user picked mean the image is re-encoded.
+            default_encoding = options['jpeg_encoder'] == 'pillow' and not options['progressive'] and options['subsampling'] == 2
+            already_compressed = (JPEGTRAN is not None and default_encoding and img.mode in ("RGB", "L")
+                                  and source_quality is not None and source_quality <= quality)
+            if options['lossless_jpeg']:
+                _optimize_jpeg_lossless(source, destination)
+                return
+            if already_compressed:
+                try:
+                    _optimize_jpeg_lossless(source, destination)
+                    return
+                except (RuntimeError, OSError):
+                    pass  # Nothing was written; Pillow's decoder often copes where jpegtran gave up, so re-encode
+        exif_data = img.info.get('exif', b'')  # Preserve EXIF data
+        if resize and source_format == 'jpeg' and img.width > max_width:
+            # Let libjpeg decode at the smallest DCT scale that still covers the target size
+            img.draft("RGB", _target_size(img.size, max_width))
+        img = _ensure_mode_for_output(img, output_format)
+        if resize and img.width > max_width:
+            if options['backend'] == 'cv2':
+                cv2 = _get_cv2()
+                # INTER_AREA is OpenCV's SIMD box-filter downscaler
+                img = Image.fromarray(cv2.resize(np.asarray(img), _target_size(img.size, max_width), interpolation=cv2.INTER_AREA))
+            else:
+                # reducing_gap shrinks by an integer factor with a cheap box reduce first, leaving the filter only the last few x
+                img = _resize(img, _target_size(img.size, max_width), _resampling_filter(options['filter'], img.width, max_width), options['reducing_gap'] or None, options['resize_stripes'])
+        if output_format == 'jpeg' and options['jpeg_encoder'] == 'turbojpeg':
+            # Encode straight from the pixel buffer with libjpeg-turbo, bypassing Pillow's encoder glue
+            subsample = (turbojpeg.TJSAMP_444, turbojpeg.TJSAMP_422, turbojpeg.TJSAMP_420)[options['subsampling']]
+            flags = turbojpeg.TJFLAG_PROGRESSIVE if options['progressive'] else 0
+            jpeg = _get_turbojpeg().encode(np.asarray(img), quality=quality, pixel_format=turbojpeg.TJPF_RGB, jpeg_subsample=subsample, flags=flags)
+            _write_output(destination, _insert_exif(jpeg, exif_data))
+        elif output_format == 'jpeg' and options['jpeg_encoder'] == 'simplejpeg':
+            subsample = ('444', '422', '420')[options['subsampling']]
+            jpeg = simplejpeg.encode_jpeg(np.asarray(img), quality=quality, colorspace='RGB', colorsubsampling=subsample, fastdct=True)
+            _write_output(destination, _insert_exif(jpeg, exif_data))
+        else:
+            img.save(destination, exif=exif_data, **options['save_kwargs'])
+        # The with block only closes the decoded source; release the converted/resized copy
+        # now so its memory goes back to Pillow's arena before the next image is read
+        img.close()
+
+def _compress_one(task):
+    """
+    Compresses a single image. Lives at module level so pool workers only
+    receive picklable primitives instead of a bound method of the compressor.
+    :param task: Tuple of (input_path, output_path, size, options).
+    :return: Error message if the image failed, otherwise None.
+    """
+    input_path, output_path, size, options = task
+    try:
+        if _can_copy_unchanged(input_path, options):
+            shutil.copyfile(input_path, output_path)  # Uses sendfile on Linux, never entering userspace
+            return
+        _process_image(_read_file(input_path, size), output_path, options)
+    except Exception as e:
+        return _error_message(input_path, size, e)
+
+def _reducing_gap_arg(value):
     """
-    Initializes worker processes with a shared progress queue.
-    :param q: Multiprocessing queue to track progress updates.
+    Parses --reducing_gap, accepting 0 (disabled) or any value of at least 1.0.
+    :param value: Command-line string.
+    :return: Reducing gap as a float.
     """
-    global progress_queue
-    progress_queue = q
+    try:
+        gap = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: '{value}'") from None
+    if gap != 0 and gap < 1.0:
+        raise argparse.ArgumentTypeError("must be 0 (disabled) or at least 1.0")
+    return gap
+
+def _workers_arg(value):
+    """
+    Parses --workers, accepting any whole number of at least 1.
+    :param value: Command-line string.
+    :return: Worker count as an int.
+    """
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: '{value}'") from None
+    if workers < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return workers
 
 class ImageCompressor:
     """
@@ -21,7 +411,11 @@ class ImageCompressor:
     Supports maintaining folder structure, resizing, and adaptive worker scaling.
     """
 
-    def __init__(self, input_folder, output_folder, quality=80, resize=False, max_width=1024, output_format='jpeg', recursive=False, collapse=False, parallel=False):
+    _pool = None  # Worker process pool shared by every compressor in this interpreter
+    _pool_size = 0
+    _pool_atexit = False  # Whether _close_pool is registered to run at interpreter exit
+
+    def __init__(self, input_folder, output_folder, quality=80, resize=False, max_width=1024, output_format='jpeg', recursive=False, collapse=False, parallel=False, workers=None, lossless_jpeg=False, fast_encode=False, backend='pillow', skip_existing=False, jpeg_encoder='pillow', filter='lanczos', progressive=False, subsampling=2, passthrough=False, reducing_gap=3.0, use_threads=False):
         """
         Initializes the ImageCompressor with user-specified options.
         
@@ -34,6 +428,18 @@ class ImageCompressor:
         :param recursive: Whether to search for images in subdirectories.
         :param collapse: Whether to flatten directory structure in output.
         :param parallel: Enable parallel processing for faster compression.
+        :param workers: Number of worker processes, or threads with use_threads, in parallel mode (default: based on system load).
+        :param lossless_jpeg: Optimize JPEG inputs losslessly with jpegtran when no resize is needed.
+        :param fast_encode: Skip the extra optimization pass when encoding (faster, slightly larger files).
+        :param backend: Library used for resizing (default: pillow). Supports 'pillow', 'cv2'.
+        :param skip_existing: Skip images whose output is already newer than the input.
+        :param jpeg_encoder: Library used to encode JPEG output (default: pillow). Supports 'pillow', 'turbojpeg', 'simplejpeg'.
+        :param filter: Resampling filter for Pillow resizing (default: lanczos). 'auto' picks one from the downscale ratio.
+        :param progressive: Write progressive JPEGs (smaller, slower to encode).
+        :param subsampling: JPEG chroma subsampling (default: 2). 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0.
+        :param passthrough: Copy images unchanged when they are already in the output format and need no resize.
+        :param reducing_gap: Pre-reduce large downscales to this multiple of the target size before filtering (default: 3.0, 0 disables).
+        :param use_threads: Use threads instead of processes in parallel mode.
         """
 
         # Check if input folder specified is valid
@@ -49,14 +455,59 @@ class ImageCompressor:
         self.recursive = recursive
         self.collapse = collapse
         self.parallel = parallel
-        self.images = self._get_images()
+        self.workers = workers
+        self.lossless_jpeg = lossless_jpeg
+        self.fast_encode = fast_encode
+        self.backend = backend
+        self.skip_existing = skip_existing
+        self.jpeg_encoder = jpeg_encoder
+        self.filter = filter
+        self.progressive = progressive
+        self.subsampling = subsampling
+        self.passthrough = passthrough
+        self.reducing_gap = reducing_gap
+        self.use_threads = use_threads
         
-        # Validate output format
+        # Validate output format before it is used to build output paths
         if self.output_format in ['jpg', 'jpeg']:
             self.output_format = 'jpeg'
         elif self.output_format not in ['jpeg', 'png', 'webp']:
             print("Invalid output format. Defaulting to 'jpeg'.")
             self.output_format = 'jpeg'
+
+        if self.filter not in RESAMPLING_FILTERS and self.filter != 'auto':
+            print("Invalid filter. Defaulting to 'lanczos'.")
+            self.filter = 'lanczos'
+
+        if self.subsampling not in (0, 1, 2):
+            print("Invalid subsampling (must be 0, 1 or 2). Defaulting to 2.")
+            self.subsampling = 2
+
+        # Pillow rejects gaps below 1.0, which would fail every resized image
+        if self.reducing_gap and self.reducing_gap < 1.0:
+            print("Invalid reducing_gap (must be 0 or at least 1.0). Defaulting to 3.0.")
+            self.reducing_gap = 3.0
+
+        if self.backend == 'cv2' and _get_cv2() is None:
+            print("OpenCV is not installed. Resizing with Pillow instead.")
+            self.backend = 'pillow'
+
+        if self.jpeg_encoder == 'turbojpeg' and _get_turbojpeg() is None:
+            print("PyTurboJPEG or libturbojpeg is not available. Encoding JPEG with Pillow instead.")
+            self.jpeg_encoder = 'pillow'
+        elif self.jpeg_encoder == 'simplejpeg' and simplejpeg is None:
+            print("simplejpeg is not installed. Encoding JPEG with Pillow instead.")
+            self.jpeg_encoder = 'pillow'
+        elif self.jpeg_encoder == 'simplejpeg' and self.progressive and self.output_format == 'jpeg':
+            print("simplejpeg only writes baseline JPEGs. Ignoring --progressive.")
+            self.progressive = False
+
+        if self.lossless_jpeg and JPEGTRAN is None:
+            print("jpegtran not found. Re-encoding JPEG inputs instead.")
+            self.lossless_jpeg = False
+
+        self.images = self._get_images()
+        self._errors = []
         
         # Ensure output folder exists
         if not os.path.exists(output_folder):
@@ -65,29 +516,52 @@ class ImageCompressor:
     def _get_images(self):
         """
         Retrieves a list of image files from the input folder.
-        :return: List of tuples containing (input_path, output_path).
-        """
-
-        image_files = []
-        if self.recursive:
-            for root, _, files in os.walk(self.input_folder):
-                for file in files:
-                    if file.lower().endswith(('jpg', 'jpeg', 'png', 'webp', 'tiff', 'gif', 'bmp')):
-                        input_path = os.path.join(root, file)
-                        if self.collapse:
-                            output_dir = self.output_folder
-                        else:
-                            relative_path = os.path.relpath(root, self.input_folder)
-                            output_dir = os.path.join(self.output_folder, relative_path)
-                        output_path = os.path.join(output_dir, os.path.splitext(file)[0] + f".{self.output_format}")
-                        image_files.append((input_path, output_path))
-        else:
-            for file in os.listdir(self.input_folder):
-                if file.lower().endswith(('jpg', 'jpeg', 'png', 'webp', 'tiff', 'gif', 'bmp')):
-                    input_path = os.path.join(self.input_folder, file)
-                    output_path = os.path.join(self.output_folder, os.path.splitext(file)[0] + f".{self.output_format}")
-                    image_files.append((input_path, output_path))
-        return image_files
+        :return: List of tuples containing (input_path, output_path, size, mtime).
+        """
+
+        return list(self._scan_images())
+
+    def _scan_images(self):
+        """
+        Walks the input folder with os.scandir, whose entries carry the file type
+        from the directory read, so telling files from directories needs no stat call.
+        Each image still costs one entry.stat() (a real syscall on Linux; Windows fills
+        it from the directory read) for the size and mtime, which choose between mmap
+        and a plain read and drive --skip_existing.
+        Output directories that will receive images are collected in self._output_dirs.
+        :return: Generator of (input_path, output_path, size, mtime) tuples.
+        """
+
+        self._output_dirs = set()
+        suffix = f".{self.output_format}"
+        # Each pending directory carries its output directory, so no per-file relpath/join is needed
+        pending = [(self.input_folder, self.output_folder)]
+        while pending:
+            root, output_dir = pending.pop()
+            prefix = os.path.join(output_dir, "")  # Ends in exactly one separator
+            try:
+                entries = os.scandir(root)
+            except OSError as e:
+                # Skip directories that can't be listed, as os.walk does, rather than abort the whole run
+                print(f"Skipping unreadable directory {root}: {e}")
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive:
+                            pending.append((entry.path, output_dir if self.collapse else prefix + entry.name))
+                    elif entry.is_file():
+                        name = entry.name
+                        dot = name.rfind('.')  # > 0 skips dotfiles without a stem, like os.path.splitext
+                        if dot > 0 and name[dot:].lower() in IMAGE_EXTENSIONS:
+                            self._output_dirs.add(output_dir)
+                            try:
+                                stat = entry.stat()
+                            except OSError:
+                                # Gone or unreadable since the listing; the worker's read fails and reports it
+                                yield entry.path, prefix + name[:dot] + suffix, 0, 0
+                                continue
+                            yield entry.path, prefix + name[:dot] + suffix, stat.st_size, stat.st_mtime
     
     def compress_images(self):
         """
@@ -101,69 +575,236 @@ class ImageCompressor:
             return
         
         print(f"Found {total_images} images. Starting compression...")
+
+        images = self.images
+        if self.skip_existing:
+            images = [image for image in images if not _is_up_to_date(image)]
+            print(f"Skipping {total_images - len(images)} images that are already up to date.")
+            if not images:
+                print("Compression complete!")
+                return
+
+        print(f"Pillow Status :::: Version: {PIL.__version__} | libjpeg-turbo: {'yes' if features.check_feature('libjpeg_turbo') else 'no'}")
         
-        if self.parallel:
-            self._compress_images_parallel()
-        else:
-            with tqdm(total=total_images, desc="Compressing", unit="image") as pbar:
-                for input_path, output_path in self.images:
-                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                    self._compress_image(input_path, output_path)
-                    pbar.update(1)
+        # Create each output directory once up front instead of once per image
+        for output_dir in self._output_dirs:
+            os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            if self.parallel:
+                self._compress_images_parallel(images)
+            else:
+                self._compress_images_serial(images)
+        finally:
+            if self._errors:
+                # One append for the whole run; workers never touch the log, so lines can't interleave
+                with open("error_log.txt", "a") as log_file:
+                    log_file.writelines(error_msg + "\n" for error_msg in self._errors)
+                self._errors = []
         
         print("Compression complete!")
+
+    def _report_error(self, error_msg):
+        """
+        Shows a failed image on the console and queues it for error_log.txt,
+        which compress_images writes in one go when the run ends.
+        :param error_msg: Message produced by _error_message.
+        """
+
+        tqdm.write(error_msg)
+        self._errors.append(error_msg)
     
-    def _compress_images_parallel(self):
+    def _options(self):
+        """
+        Collects the settings _process_image needs into a plain, picklable dict.
+        :return: Dict of compression settings.
         """
-        Compress images in parallel mode using multiple worker processes.
-        Dynamically adjusts workers based on system load.
+
+        return {
+            'quality': self.quality,
+            'resize': self.resize,
+            'max_width': self.max_width,
+            'output_format': self.output_format,
+            'lossless_jpeg': self.lossless_jpeg,
+            'backend': self.backend,
+            'jpeg_encoder': self.jpeg_encoder,
+            'filter': self.filter,
+            'progressive': self.progressive,
+            'subsampling': self.subsampling,
+            'passthrough': self.passthrough,
+            'reducing_gap': self.reducing_gap,
+            'save_kwargs': self._save_kwargs(),
+        }
+
+    def _save_kwargs(self):
+        """
+        Builds the Image.save arguments for the output format once per batch,
+        passing each encoder only the settings it uses.
+        :return: Dict of keyword arguments for Image.save.
+        """
+
+        if self.output_format == 'png':
+            return {'format': 'PNG', 'optimize': not self.fast_encode}
+        if self.output_format == 'webp':
+            return {'format': 'WEBP', 'quality': self.quality}
+        return {'format': 'JPEG', 'quality': self.quality, 'optimize': not self.fast_encode,
+                'progressive': self.progressive, 'subsampling': self.subsampling}
+
+    def _tasks(self, images, resize_stripes=RESIZE_STRIPES):
+        """
+        Builds the per-image work items passed to _compress_one, one at a time as
+        they are consumed, so a large batch never holds a second list of tasks.
+        :param images: Image tuples from _get_images.
+        :param resize_stripes: Most threads a single very large image may resize on.
+        :return: Generator of task tuples.
+        """
+
+        options = dict(self._options(), resize_stripes=resize_stripes)
+        return ((input_path, output_path, size, options) for input_path, output_path, size, _ in images)
+
+    def _compress_images_serial(self, images):
+        """
+        Compress images in the main process while background threads read upcoming
+        files ahead and write finished ones behind, overlapping disk I/O with encoding.
+        :param images: Image tuples from _get_images.
         """
 
-        num_cores = multiprocessing.cpu_count()
-        system_load = psutil.cpu_percent()
+        _init_image_arena()
+        tasks = self._tasks(images)
+        reads = deque()
+        writes = deque()
+
+        def prefetch(task):
+            # Start reading the file in the background unless it will just be copied
+            input_path, _, size, options = task
+            pending = None if _can_copy_unchanged(input_path, options) else read_pool.submit(_read_file, input_path, size)
+            reads.append((task, pending))
+
+        def reap(limit):
+            # Collect finished writes, blocking only while more than `limit` are in flight
+            while len(writes) > limit or (writes and writes[0][-1].done()):
+                input_path, size, pending = writes.popleft()
+                try:
+                    pending.result()
+                except Exception as e:
+                    self._report_error(_error_message(input_path, size, e))
+
+        with ThreadPoolExecutor(IO_THREADS) as read_pool, ThreadPoolExecutor(IO_THREADS) as write_pool:
+            for task in islice(tasks, READ_AHEAD):
+                prefetch(task)
 
-        print(f"CPU Status :::: CPU Cores: {num_cores} | CPU Load: {system_load}")
+            with tqdm(total=len(images), desc="Compressing", unit="image") as pbar:
+                while reads:
+                    (input_path, output_path, size, options), pending = reads.popleft()
+                    for task in islice(tasks, 1):
+                        prefetch(task)
+                    try:
+                        if pending is None:
+                            writes.append((input_path, size, write_pool.submit(shutil.copyfile, input_path, output_path)))
+                            pbar.update(1)
+                            continue
+                        buffer = io.BytesIO()
+                        _process_image(pending.result(), buffer, options)
+                        writes.append((input_path, size, write_pool.submit(_write_file, output_path, buffer.getvalue())))
+                    except Exception as e:
+                        self._report_error(_error_message(input_path, size, e))
+                    reap(READ_AHEAD)
+                    pbar.update(1)
+                reap(0)
+
+    def _compress_images_parallel(self, images):
+        """
+        Compress images in parallel mode using multiple worker processes, or threads if requested.
+        Dynamically adjusts workers based on system load unless a worker count is given.
+        :param images: Image tuples from _get_images.
+        """
 
-        if system_load <= 25:
-            num_cores = max(1, (num_cores // 2) + 1)
-        elif system_load <= 50:
-            num_cores = max(1, num_cores // 2)
+        if self.workers:
+            num_cores = self.workers
         else:
-            num_cores = 1
+            num_cores = os.cpu_count() or 1
+            # Sample over a short interval; the first un-primed call to cpu_percent() always reports 0.0
+            system_load = psutil.cpu_percent(interval=0.1)
+
+            print(f"CPU Status :::: CPU Cores: {num_cores} | CPU Load: {system_load}")
+
+            # Encoding scales almost linearly with cores, so only back off when the machine is busy
+            if system_load >= 80:
+                num_cores = 1
+            elif system_load >= 50:
+                num_cores = max(1, num_cores // 2)
+
+        # Workers already keep the cores busy, so large images only get stripe threads for idle ones
+        tasks = self._tasks(images, max(1, min(RESIZE_STRIPES, (os.cpu_count() or 1) // num_cores)))
+        if self.use_threads:
+            print(f"Using {num_cores} worker threads for parallel compression.")
+            # Pillow and the JPEG encoders release the GIL in their C code, so threads
+            # compress in parallel without pickling tasks or starting processes
+            _init_image_arena()
+            in_flight = deque()
+            with ThreadPoolExecutor(num_cores) as executor, tqdm(total=len(images), desc="Total Progress", unit="image") as pbar:
+                # Submit a few tasks per thread at a time; executor.map would queue a future for every image at once
+                for task in tasks:
+                    in_flight.append(executor.submit(_compress_one, task))
+                    if len(in_flight) >= num_cores * 4:
+                        error_msg = in_flight.popleft().result()
+                        if error_msg:
+                            self._report_error(error_msg)
+                        pbar.update(1)
+                while in_flight:
+                    error_msg = in_flight.popleft().result()
+                    if error_msg:
+                        self._report_error(error_msg)
+                    pbar.update(1)
+            return
         
         print(f"Using {num_cores} worker processes for parallel compression.")
-        
-        with Manager() as manager:
-            progress_queue = manager.Queue()
-            pool = multiprocessing.Pool(processes=num_cores, initializer=worker_init, initargs=(progress_queue,))
-            workers = {pool.apply_async(self._compress_image, args=(input_path, output_path, idx)) for idx, (input_path, output_path) in enumerate(self.images)}
-            
-            with tqdm(total=len(self.images), desc="Total Progress", unit="image") as pbar:
-                completed = 0
-                while completed < len(self.images):
-                    progress_queue.get()
-                    completed += 1
-                    pbar.update(1)
-            pool.close()
-            pool.join()
-    
-    def _compress_image(self, input_path, output_path, worker_id=None):
+
+        # About four chunks per worker, like Pool.map, amortizes dispatch while keeping the tail balanced.
+        # Results and progress arrive a chunk at a time, and each chunk counts once towards
+        # maxtasksperchild, so large batches are capped at a small chunk.
+        chunksize = max(1, min(MAX_CHUNKSIZE, len(images) // (num_cores * 4)))
+        pool = self._get_pool(num_cores)
         try:
-            with Image.open(input_path) as img:
-                exif_data = img.info.get('exif')  # Preserve EXIF data
-                img = img.convert("RGB") # Ensure RGB format for compatibility
-                if self.resize and img.width > self.max_width:
-                    new_height = int((self.max_width / img.width) * img.height)
-                    img = img.resize((self.max_width, new_height), Image.Resampling.LANCZOS)
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                img.save(output_path, format=self.output_format.upper(), quality=self.quality, optimize=True, exif=exif_data)
-                if worker_id is not None:
-                    progress_queue.put(worker_id)
-        except Exception as e:
-            error_msg = f"Error :: {input_path} :: {e}"
-            tqdm.write(error_msg)
-            with open("error_log.txt", "a") as log_file:
-                log_file.write(error_msg + "\n")
+            # The pool pulls tasks from the generator as its queue drains, so only a few chunks exist at once
+            for error_msg in tqdm(pool.imap_unordered(_compress_one, tasks, chunksize=chunksize), total=len(images), desc="Total Progress", unit="image"):
+                if error_msg:
+                    self._report_error(error_msg)
+        except BaseException:
+            # Don't leave half-finished work queued in a pool that later batches would reuse
+            ImageCompressor._close_pool()
+            raise
+
+    @classmethod
+    def _get_pool(cls, processes):
+        """
+        Returns the shared worker pool, starting it on first use. Later batches reuse it,
+        so they don't pay for spawning workers and importing Pillow in each one again.
+        :param processes: Number of worker processes required.
+        :return: multiprocessing.Pool instance.
+        """
+
+        if cls._pool is not None and cls._pool_size != processes:
+            cls._close_pool()
+        if cls._pool is None:
+            cls._pool = multiprocessing.Pool(processes=processes, initializer=_init_image_arena, maxtasksperchild=200)
+            cls._pool_size = processes
+            if not cls._pool_atexit:
+                atexit.register(cls._close_pool)
+                cls._pool_atexit = True
+        return cls._pool
+
+    @classmethod
+    def _close_pool(cls):
+        """
+        Shuts down the shared worker pool, if one is running.
+        """
+
+        if cls._pool is not None:
+            cls._pool.terminate()
+            cls._pool.join()
+            cls._pool = None
+            cls._pool_size = 0
 
 if __name__ == "__main__":
     """
@@ -180,11 +821,23 @@ if __name__ == "__main__":
     parser.add_argument("--recursive", action="store_true", help="Enable recursive search for images in subdirectories")
     parser.add_argument("--collapse", action="store_true", help="Break folder structure in output directory")
     parser.add_argument("--parallel", action="store_true", help="Enable parallel processing for faster compression")
+    parser.add_argument("--workers", type=_workers_arg, default=None, help="Number of worker processes, or threads with --use_threads, in parallel mode (default: based on system load)")
+    parser.add_argument("--use_threads", action="store_true", help="Use threads instead of processes in parallel mode")
+    parser.add_argument("--lossless_jpeg", action="store_true", help="Losslessly optimize JPEG inputs with jpegtran instead of re-encoding when no resize is needed")
+    parser.add_argument("--fast_encode", action="store_true", help="Skip the extra optimization pass when encoding (faster, slightly larger files)")
+    parser.add_argument("--backend", type=str, default='pillow', choices=['pillow', 'cv2'], help="Library used for resizing (default: pillow)")
+    parser.add_argument("--skip_existing", action="store_true", help="Skip images whose output is already newer than the input")
+    parser.add_argument("--jpeg_encoder", type=str, default='pillow', choices=['pillow', 'turbojpeg', 'simplejpeg'], help="Library used to encode JPEG output (default: pillow)")
+    parser.add_argument("--filter", type=str, default='lanczos', choices=['auto'] + list(RESAMPLING_FILTERS), help="Resampling filter used when resizing (default: lanczos)")
+    parser.add_argument("--reducing_gap", type=_reducing_gap_arg, default=3.0, help="Pre-reduce large downscales to this multiple of the target size before filtering; lower is faster down to 1.0, 0 disables (default: 3.0)")
+    parser.add_argument("--progressive", action="store_true", help="Write progressive JPEGs (smaller, slower to encode)")
+    parser.add_argument("--subsampling", type=int, default=2, choices=[0, 1, 2], help="JPEG chroma subsampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0 (default: 2)")
+    parser.add_argument("--passthrough", action="store_true", help="Copy images unchanged when they are already in the output format and need no resize")
     
     args = parser.parse_args()
     
     try:
-        compressor = ImageCompressor(args.input_folder, args.output_folder, args.quality, args.resize, args.max_width, args.output_format, args.recursive, args.collapse, args.parallel)
+        compressor = ImageCompressor(args.input_folder, args.output_folder, args.quality, args.resize, args.max_width, args.output_format, args.recursive, args.collapse, args.parallel, args.workers, args.lossless_jpeg, args.fast_encode, args.backend, args.skip_existing, args.jpeg_encoder, args.filter, args.progressive, args.subsampling, args.passthrough, args.reducing_gap, args.use_threads)
         compressor.compress_images()
     except FileNotFoundError as e:
         print(e)